@@ -0,0 +1,278 @@
+"""
+Daily archive of what the dashboard would have shown, without Streamlit.
+
+For every day in the range and every hour of that day it records the Overview
+KPIs (today up to that hour and month to date), every station's occupancy over
+the trailing 3-hour window (and the last hour, in the `_1h` columns) with those
+above 75% / below 25% capacity marked in `status`, and once per day the bikes flagged for triage month to date. Hours are
+wall-clock 0-23 every day; on the spring-forward day 01:00 doesn't exist, so its
+rows repeat the 02:00 snapshot with nonexistent_hour set. Days are fanned out
+over a process pool and written as date-partitioned parquet:
+
+    <out>/kpi/date=2022-06-17/part-0.parquet
+    <out>/station_status/date=2022-06-17/part-0.parquet
+    <out>/flagged_bikes/date=2022-06-17/part-0.parquet
+    <out>/station_report.parquet  (trip ends at unknown or renamed stations)
+
+    uv run python app/batch_reports.py --start 2022-01-01 --end 2022-12-31
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+from utils.data_loader import (
+    STORAGE,
+    load_station_report,
+    load_stations_data,
+    load_trips_data,
+)
+from utils.helper import (
+    get_under_capacity_stations,
+    label_bike_issues,
+    summarise_trips,
+)
+from utils.station_index import StationIndex
+
+UK_TZ = "Europe/London"
+WINDOW = pd.Timedelta(hours=3)
+RECENT_WINDOW = pd.Timedelta(hours=1)
+OUTPUTS = ["kpi", "station_status", "flagged_bikes"]
+TEXT_KPIS = ["busiest_start", "busiest_end", "top_bike", "top_faulty_bike"]
+# Not Gold/snapshots: that folder belongs to the pipeline and its manifest
+DEFAULT_OUT = STORAGE / "batch_reports"
+
+# Set in each worker by load_shared_dataset
+TRIPS = None
+STATION_INDEX = None
+START_VALUES = None
+END_ORDER = None
+END_VALUES = None
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Shared dataset
+#
+
+
+def write_shared_dataset(cache_dir):
+    """
+    Load the Silver trips once, sorted by start_date (they already carry dense
+    station codes), and write them as uncompressed Arrow files that every worker
+    memory-maps read-only. Returns the trip date range and the Silver report of
+    unknown / renamed stations.
+    """
+    stations = load_stations_data()
+    trips = load_trips_data()
+    for col in ["start_date", "end_date"]:
+        trips[col] = pd.to_datetime(trips[col], utc=True).dt.tz_convert(UK_TZ)
+    trips = trips.sort_values("start_date", kind="stable").reset_index(drop=True)
+
+    feather.write_feather(trips, cache_dir / "trips.arrow", compression="uncompressed")
+    feather.write_feather(
+        stations, cache_dir / "stations.arrow", compression="uncompressed"
+    )
+    return trips["start_date"].min(), trips["start_date"].max(), load_station_report()
+
+
+def load_shared_dataset(cache_dir):
+    def read(name):
+        with pa.memory_map(str(cache_dir / name)) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+    use_dataset(read("trips.arrow"), read("stations.arrow"))
+
+
+def use_dataset(trips, stations):
+    """
+    Point build_day at already prepared trips (London time, sorted by start_date).
+    """
+    global TRIPS, STATION_INDEX, START_VALUES, END_ORDER, END_VALUES
+
+    TRIPS = trips
+    STATION_INDEX = StationIndex(stations)
+
+    # Sorted lookups so each snapshot slices its window instead of scanning the year
+    START_VALUES = TRIPS["start_date"].dt.tz_convert(None).to_numpy()
+    end_values = TRIPS["end_date"].dt.tz_convert(None).to_numpy()
+    END_ORDER = np.argsort(end_values, kind="stable")
+    END_VALUES = end_values[END_ORDER]
+
+
+def trips_starting(start, end):
+    lo, hi = np.searchsorted(
+        START_VALUES, [start.tz_convert(None), end.tz_convert(None)]
+    )
+    return TRIPS.iloc[lo:hi]
+
+
+def trips_ending(start, end):
+    lo, hi = np.searchsorted(END_VALUES, [start.tz_convert(None), end.tz_convert(None)])
+    return TRIPS.iloc[END_ORDER[lo:hi]]
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Snapshots
+#
+
+
+def snapshot_hours(day):
+    """
+    (hour, snapshot time, hour doesn't exist) for the wall-clock hours 0-23, as
+    picked on the Station Capacity slider. On the spring-forward day 01:00 doesn't
+    exist, so hour 1 is flagged and taken at 02:00; on the autumn day the repeated
+    01:00 uses its first (BST) occurrence.
+    """
+    wall = pd.date_range(day, periods=24, freq="h")
+    times, missing = (
+        wall.tz_localize(
+            UK_TZ, ambiguous=np.ones(24, dtype=bool), nonexistent=nonexistent
+        )
+        for nonexistent in ("shift_forward", "NaT")
+    )
+    return list(zip(wall.hour, times, missing.isna()))
+
+
+def station_snapshot(now, window):
+    """
+    Every station's occupancy from the trips ending in the `window` before `now`,
+    with status over_75 / under_25 / ok.
+    """
+    bikes_present = STATION_INDEX.occupancy(trips_ending(now - window, now))
+    status = STATION_INDEX.status(bikes_present)
+    under = get_under_capacity_stations(status, 0.25).index
+    status["status"] = "ok"
+    status.loc[under, "status"] = "under_25"
+    status.loc[status["at_capacity"], "status"] = "over_75"
+    # The row is the dense station code; keep it so readers can index by it
+    return status.rename_axis("code").reset_index()
+
+
+def build_day(day, out_dir):
+    day_start = pd.Timestamp(day).tz_localize(UK_TZ)
+    day_end = (pd.Timestamp(day) + pd.Timedelta(days=1)).tz_localize(UK_TZ)
+    month_start = day_start.replace(day=1)
+
+    # Month to date stops at midnight, as on the Overview page
+    month_kpis = summarise_trips(trips_starting(month_start, day_start))
+
+    kpi_rows = []
+    station_frames = []
+    for hour, now, nonexistent in snapshot_hours(day):
+        today_kpis = summarise_trips(trips_starting(day_start, now))
+        kpi_rows.append(
+            {
+                "hour": hour,
+                "nonexistent_hour": nonexistent,
+                **{f"today_{k}": v for k, v in today_kpis.items()},
+                **{f"month_{k}": v for k, v in month_kpis.items()},
+            }
+        )
+
+        # Every station, so the Station Capacity page can map the whole network,
+        # plus the last hour alone for the Overview's "right now" summary
+        status = station_snapshot(now, WINDOW)
+        recent = station_snapshot(now, RECENT_WINDOW)
+        station_frames.append(
+            status[
+                [
+                    "code",
+                    "id",
+                    "name",
+                    "docks_count",
+                    "bikes_present",
+                    "capacity_pct",
+                    "status",
+                ]
+            ].assign(
+                bikes_present_1h=recent["bikes_present"],
+                capacity_pct_1h=recent["capacity_pct"],
+                status_1h=recent["status"],
+                hour=hour,
+                nonexistent_hour=nonexistent,
+            )
+        )
+
+    # Flagged bikes as the Bike Maintenance page would show them at the end of the day
+    month_df = trips_starting(month_start, day_end)
+    triage_df, _ = label_bike_issues(month_df[month_df["end_date"] <= day_end])
+    flagged = (
+        triage_df.sort_values("end_date")
+        .groupby("bike_id")
+        .agg(
+            issues=("bike_issue", "size"),
+            latest_issue=("bike_issue", "last"),
+            latest_end_station=("end_station_name", "last"),
+            latest_end_date=("end_date", "last"),
+        )
+        .sort_values("issues", ascending=False)
+        .reset_index()
+    )
+
+    outputs = {
+        # Bike ids come back as ints or "N/A"; keep the column types stable
+        "kpi": pd.DataFrame(kpi_rows).astype(
+            {f"{p}_{k}": str for p in ("today", "month") for k in TEXT_KPIS}
+        ),
+        "station_status": pd.concat(station_frames, ignore_index=True),
+        "flagged_bikes": flagged,
+    }
+    for name, df in outputs.items():
+        partition = out_dir / name / f"date={day_start.date()}"
+        partition.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(partition / "part-0.parquet", index=False)
+
+    return str(day_start.date()), {name: len(df) for name, df in outputs.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--start", help="first day (YYYY-MM-DD), default: first trip")
+    parser.add_argument("--end", help="last day (YYYY-MM-DD), default: last trip")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = Path(tmp)
+        first_trip, last_trip, station_report = write_shared_dataset(cache_dir)
+        days = pd.date_range(
+            args.start or first_trip.date(), args.end or last_trip.date(), freq="D"
+        )
+        days = [d.strftime("%Y-%m-%d") for d in days]
+        print(f"Building {len(days)} day(s) of snapshots with {args.workers} worker(s)")
+
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=load_shared_dataset,
+            initargs=(cache_dir,),
+        ) as pool:
+            for day, counts in pool.map(
+                build_day, days, [args.out] * len(days), chunksize=4
+            ):
+                print(f"  {day}: " + ", ".join(f"{n} {k}" for k, n in counts.items()))
+
+    # Trip ends at stations missing from (or renamed in) the station list
+    args.out.mkdir(parents=True, exist_ok=True)
+    station_report.to_parquet(args.out / "station_report.parquet", index=False)
+    print(
+        f"{station_report['trips'].sum():,} trip ends with unknown or renamed stations"
+    )
+
+    print(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
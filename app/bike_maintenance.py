@@ -3,25 +3,19 @@ import pandas as pd
 import pytz
 from datetime import datetime
 import pydeck as pdk
-from utils.data_loader import load_trips_data, load_stations_data
-from utils.helper import dq_validity_bike_triage
+from utils.data_loader import load_trips_data, load_stations_data, load_gold_table
+from utils.helper import label_bike_issues
+from utils.station_index import StationIndex
+from utils.bike_anomaly import FEATURES
 
 
 def show_bike_maintenance():
     st.subheader("🔧 Bike Maintenance Dashboard")
 
-    # Load data
-    trips_df = load_trips_data()
+    # Load data: June 2022 only, already in London time with station codes (Silver)
+    trips_df = load_trips_data(months=["2022-06"])
     stations_df = load_stations_data()
 
-    # Convert dates to London timezone
-    trips_df["start_date"] = pd.to_datetime(
-        trips_df["start_date"], utc=True
-    ).dt.tz_convert("Europe/London")
-    trips_df["end_date"] = pd.to_datetime(trips_df["end_date"], utc=True).dt.tz_convert(
-        "Europe/London"
-    )
-
     # Simulate "now" on 17 June 2022 using current London time
     uk_tz = pytz.timezone("Europe/London")
     now_uk = datetime.now(uk_tz)
@@ -36,19 +30,11 @@ def show_bike_maintenance():
         & (trips_df["end_date"] <= reference_date_now)
     ]
 
-    # Run data quality checks with operationally meaningful labels
-    dq_summary, dq_masks = dq_validity_bike_triage(trips_df, return_masks=True)
-
-    # Combine all masks into one issue mask
-    issue_mask = pd.concat(dq_masks.values(), axis=1).any(axis=1)
-    triage_df = trips_df[issue_mask].copy()
-
-    # Add issue labels to the triage DataFrame
-    triage_df["bike_issue"] = ""
-    for rule, mask in dq_masks.items():
-        triage_df.loc[mask, "bike_issue"] += rule + "; "
+    # Dense station codes so the map lookup below is array indexing
+    station_index = StationIndex(stations_df)
 
-    triage_df["bike_id"] = triage_df["bike_id"].astype(str)
+    # Data quality flags from Silver, with operationally meaningful labels
+    triage_df, dq_masks = label_bike_issues(trips_df)
 
     # --- NEW: Filter by fault type ---
     all_faults = list(dq_masks.keys())
@@ -67,6 +53,46 @@ def show_bike_maintenance():
 
     st.metric("🤖 Bikes flagged for triage (June)", len(triage_df))
 
+    # Gradual drift that the fixed triage rules above don't catch
+    st.markdown("### 📉 Bikes Drifting From Their Usual Behaviour")
+    # Scored over the full ride history by the pipeline's Gold stage
+    anomaly_df = load_gold_table("bike_anomaly")
+    if anomaly_df.empty:
+        st.info("Not enough ride history to score bike behaviour yet.")
+    else:
+        st.dataframe(
+            anomaly_df.head(10)[
+                [
+                    "rank",
+                    "bike_id",
+                    "anomaly_score",
+                    "main_driver",
+                    "trips",
+                    *[f"recent_{f}" for f in FEATURES],
+                    *[f"baseline_{f}" for f in FEATURES],
+                ]
+            ]
+            .rename(
+                columns={
+                    "rank": "Rank",
+                    "bike_id": "Bike ID",
+                    "anomaly_score": "Anomaly Score",
+                    "main_driver": "Main Driver",
+                    "trips": "Trips",
+                    **{
+                        f"recent_{f}": f"{label} (recent)"
+                        for f, label in FEATURES.items()
+                    },
+                    **{
+                        f"baseline_{f}": f"{label} (usual)"
+                        for f, label in FEATURES.items()
+                    },
+                }
+            )
+            .style.format(precision=2),
+            hide_index=True,
+        )
+
     if triage_df.empty:
         st.success("No bikes currently flagged for the selected fault types.")
         return
@@ -122,10 +148,19 @@ def show_bike_maintenance():
     # Map of most recent ride’s end location
     st.markdown("### 🗺️ Most Recent Ride Destination")
     if not bike_details.empty:
-        end_station = bike_details["end_station_name"].values[0]
-        end_info = stations_df[stations_df["name"] == end_station][
-            ["latitude", "longitude"]
-        ]
+        end_code = bike_details["end_station_code"].values[0]
+        if end_code < 0:
+            # Unknown id; the station may still be listed under the same name
+            end_code = station_index.codes_for_names(
+                bike_details["end_station_name"].values
+            )[0]
+        found = [end_code] if end_code >= 0 else []
+        end_info = pd.DataFrame(
+            {
+                "latitude": station_index.latitude[found],
+                "longitude": station_index.longitude[found],
+            }
+        )
         if not end_info.empty:
             st.pydeck_chart(
                 pdk.Deck(
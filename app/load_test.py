@@ -0,0 +1,322 @@
+"""
+Headless load test for the dashboard.
+
+Writes synthetic Bronze trip and station data to a temporary storage folder,
+builds Silver and Gold from it with app/pipeline.py, then drives app/main.py
+through Streamlit's AppTest with many concurrent simulated sessions reading that
+folder through utils.data_loader. Reports p50/p95/p99 render latency, throughput
+and, per worker process, RSS after setup and the peak while rendering.
+
+    uv run python app/load_test.py --processes 2 --sessions 8 --iterations 3
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit import config
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = Path(__file__).resolve().parent
+MAIN_SCRIPT = APP_DIR / "main.py"
+
+# Must match the sidebar options in main.py
+PAGES = ["📊 Overview", "🔧 Bike Maintenance", "🌇️ Station Capacity / Rebalancing"]
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Synthetic data
+#
+
+
+def make_synthetic_stations(n_stations=800, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_stations + 1)
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "name": pd.array([f"Synthetic Station {i}" for i in ids], dtype="string"),
+            "latitude": 51.5074 + rng.normal(0, 0.03, n_stations),
+            "longitude": -0.1278 + rng.normal(0, 0.05, n_stations),
+            "docks_count": rng.integers(10, 60, n_stations),
+            "bikes_count": rng.integers(0, 10, n_stations),
+            "install_date": pd.Timestamp("2015-01-01"),
+            "removal_date": pd.NaT,
+        }
+    )
+
+
+def with_bad_values(values, rng, rate, bad):
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = bad
+    return values
+
+
+def make_synthetic_trips(stations, n_trips=200_000, trips_per_bike=100, seed=0):
+    """
+    June 2022 trips (up to the end of the simulated 17 June) in the raw Bronze
+    shape. A few percent break the triage rules (bad durations, test bike ids,
+    missing station and rental ids) so the fault filters and the flagged-bike
+    picker have something to show. Each bike gets enough trips for the drift
+    scorer's history, and a few bikes' rides get much longer over the last days.
+    """
+    rng = np.random.default_rng(seed)
+    n_bikes = max(1, n_trips // trips_per_bike)
+    month_start = pd.Timestamp("2022-06-01", tz="UTC")
+    offsets = rng.integers(0, 17 * 86400 + 86399, n_trips)
+    start_date = month_start + pd.to_timedelta(offsets, unit="s")
+    bike_id = rng.integers(1, n_bikes + 1, n_trips)
+
+    duration = rng.gamma(2.0, 600.0, n_trips).astype(int) + 60
+    drifting = (bike_id % 100 == 0) & (offsets > 14 * 86400)
+    duration[drifting] *= 4
+    faulty = rng.random(n_trips) < 0.02
+    duration[faulty] = rng.choice([0, -60, 90_000], faulty.sum())
+    end_date = start_date + pd.to_timedelta(np.clip(duration, 0, None), unit="s")
+
+    station_ids = stations["id"].to_numpy()
+    station_names = stations["name"].to_numpy()
+    start_idx = rng.integers(0, len(stations), n_trips)
+    end_idx = rng.integers(0, len(stations), n_trips)
+
+    # A few trips end at a station that is missing from the station list
+    end_station_id = station_ids[end_idx]
+    end_station_name = station_names[end_idx].astype(object)
+    retired = rng.random(n_trips) < 0.005
+    end_station_id[retired] = station_ids.max() + 1
+    end_station_name[retired] = "Retired Station"
+
+    trips = pd.DataFrame(
+        {
+            "rental_id": with_bad_values(np.arange(1, n_trips + 1), rng, 0.002, None),
+            "duration": duration,
+            "bike_id": with_bad_values(bike_id, rng, 0.005, "TEST"),
+            "bike_model": "CLASSIC",
+            "start_date": start_date,
+            "end_date": end_date,
+            "start_station_id": with_bad_values(
+                station_ids[start_idx], rng, 0.003, None
+            ),
+            "start_station_name": station_names[start_idx],
+            "end_station_id": with_bad_values(end_station_id, rng, 0.003, None),
+            "end_station_name": end_station_name,
+        }
+    )
+    # Nullable strings, as cast_columns leaves the names in Silver
+    return trips.astype({"start_station_name": "string", "end_station_name": "string"})
+
+
+def write_synthetic_bronze(bronze, n_trips):
+    bronze.mkdir(parents=True)
+    stations = make_synthetic_stations()
+    stations.to_parquet(bronze / "cycle_stations.parquet", index=False)
+    trips = make_synthetic_trips(stations, n_trips=n_trips)
+    # Ids mixed with bad values go in as text; cast_columns coerces them as it
+    # would a dirty export
+    mixed = trips.select_dtypes(object).columns
+    trips = trips.astype(dict.fromkeys(mixed, "string"))
+    trips.to_parquet(bronze / "cycle_hire_2022.parquet", index=False)
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Simulated sessions
+#
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_session(session_id, iterations, timeout):
+    rng = random.Random(session_id)
+    at = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=timeout)
+    timings = []
+    errors = []
+
+    def timed(action, step):
+        start = time.perf_counter()
+        step()
+        timings.append((action, time.perf_counter() - start))
+        if at.exception:
+            errors.append((action, at.exception[0].message))
+
+    def go_to(page):
+        timed(f"open {page}", at.sidebar.selectbox[0].select(page).run)
+
+    timed("initial load", at.run)
+
+    for _ in range(iterations):
+        go_to(PAGES[0])
+
+        # Bike maintenance: narrow the fault filter, then inspect a flagged bike
+        go_to(PAGES[1])
+        faults = at.multiselect[0].options
+        subset = rng.sample(faults, rng.randint(1, len(faults)))
+        timed("filter faults", at.multiselect[0].set_value(subset).run)
+        if at.main.selectbox:
+            bike = rng.choice(at.main.selectbox[0].options)
+            timed("select bike", at.main.selectbox[0].select(bike).run)
+
+        # Station capacity: sweep the hour slider, then pick an origin station
+        go_to(PAGES[2])
+        for hour in sorted(rng.sample(range(24), 4)):
+            timed("slide hour", at.sidebar.slider[0].set_value(hour).run)
+        # Options are station codes shown by name
+        station = rng.randrange(len(at.main.selectbox[0].options))
+        timed("select station", at.main.selectbox[0].select(station).run)
+
+    return timings, errors
+
+
+def run_worker(worker_id, ready, sessions, iterations, timeout):
+    sys.path.insert(0, str(APP_DIR))
+    # Session threads have no ScriptRunContext outside AppTest.run; that's expected
+    # (filtered: Streamlit resets its loggers' levels whenever config is parsed)
+    logging.getLogger(
+        "streamlit.runtime.scriptrunner_utils.script_run_context"
+    ).addFilter(lambda record: record.levelno >= logging.ERROR)
+    # AppTest.run only patches this on while it runs, so one session finishing would
+    # switch it off under the others (and drop their selectbox format_funcs)
+    config.set_option("global.appTest", True)
+    session_ids = [worker_id * sessions + i for i in range(sessions)]
+    setup_rss = peak_rss_mb()
+
+    # Every process starts rendering together, once all the setup is done;
+    # wall-clock time so the spans are comparable across processes
+    ready.wait()
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(
+            pool.map(
+                lambda sid: run_session(sid, iterations, timeout),
+                session_ids,
+            )
+        )
+    finished = time.time()
+
+    timings = [t for session_timings, _ in results for t in session_timings]
+    errors = [e for _, session_errors in results for e in session_errors]
+    return worker_id, timings, errors, (setup_rss, peak_rss_mb()), (started, finished)
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Reporting
+#
+
+
+def summarise_latency(timings):
+    by_action = defaultdict(list)
+    for action, seconds in timings:
+        by_action[action].append(seconds)
+    by_action["ALL"] = [seconds for _, seconds in timings]
+
+    rows = []
+    for action, values in by_action.items():
+        ms = np.array(values) * 1000
+        rows.append(
+            {
+                "action": action,
+                "renders": len(ms),
+                "p50_ms": np.percentile(ms, 50),
+                "p95_ms": np.percentile(ms, 95),
+                "p99_ms": np.percentile(ms, 99),
+                "max_ms": ms.max(),
+            }
+        )
+    return pd.DataFrame(rows).set_index("action").round(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=4, help="sessions per process")
+    parser.add_argument(
+        "--iterations", type=int, default=2, help="page tours per session"
+    )
+    parser.add_argument(
+        "--trips", type=int, default=200_000, help="synthetic trip rows"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120.0, help="per-render timeout (s)"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage:
+        write_synthetic_bronze(Path(storage) / "Bronze", args.trips)
+        # The pipeline and the workers' utils.data_loader both read this folder
+        os.environ["BIKE_HIRE_STORAGE"] = storage
+        subprocess.run([sys.executable, str(APP_DIR / "pipeline.py")], check=True)
+
+        # Fresh interpreters, so the Bronze frames built here don't count in the
+        # workers' RSS
+        spawn = multiprocessing.get_context("spawn")
+        with spawn.Manager() as manager:
+            ready = manager.Barrier(args.processes)
+            with ProcessPoolExecutor(
+                max_workers=args.processes, mp_context=spawn
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        run_worker,
+                        w,
+                        ready,
+                        args.sessions,
+                        args.iterations,
+                        args.timeout,
+                    )
+                    for w in range(args.processes)
+                ]
+                results = [f.result() for f in futures]
+
+    timings = [t for _, worker_timings, _, _, _ in results for t in worker_timings]
+    errors = [e for _, _, worker_errors, _, _ in results for e in worker_errors]
+    # Throughput over the rendering only: the pipeline run and process spawn are
+    # excluded
+    spans = [span for *_, span in results]
+    wall = max(end for _, end in spans) - min(start for start, _ in spans)
+
+    print(
+        f"\n{args.processes} process(es) x {args.sessions} session(s), "
+        f"{args.iterations} iteration(s), {args.trips:,} synthetic trips\n"
+    )
+    print(summarise_latency(timings).to_string())
+    print(f"\nThroughput: {len(timings) / wall:.2f} renders/s over {wall:.1f}s")
+    # ru_maxrss only grows, so the rendering peak is reported against the setup one
+    for worker_id, _, _, (setup_rss, rss), _ in sorted(results):
+        print(
+            f"Process {worker_id}: RSS {setup_rss:.0f} MB after setup, "
+            f"peak {rss:.0f} MB while rendering (+{rss - setup_rss:.0f} MB)"
+        )
+
+    if errors:
+        print(f"\n{len(errors)} render(s) raised exceptions:")
+        for action, message in errors[:10]:
+            print(f"  {action}: {message}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+"""
+Bronze → Silver → Gold pipeline for the dashboard data.
+
+Each stage lists its partitions and the input files each one is built from.
+The content hash of those inputs is stored in a manifest, so a rerun skips
+every partition whose inputs are unchanged and rebuilds only the affected ones.
+
+    Bronze/cycle_stations.parquet     → Silver/cycle_stations.parquet
+    Bronze/cycle_hire_<year>.parquet  → Silver/cycle_hire/month=YYYY-MM/
+                                      → Silver/station_report/
+    Silver/cycle_hire/month=YYYY-MM/  → Gold/snapshots/*/date=YYYY-MM-DD/
+    Silver/cycle_hire/                → Gold/bike_anomaly.parquet
+                                      → Gold/bike_anomaly_state/
+
+    uv run python app/pipeline.py            # rebuild whatever changed
+    uv run python app/pipeline.py --force    # rebuild everything
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import batch_reports
+import pandas as pd
+from utils.bike_anomaly import (
+    init_anomaly_state,
+    score_bike_anomalies,
+    trip_features,
+    update_anomaly_state,
+)
+from utils.data_loader import gold, silver
+from utils.data_loader import store as bronze
+from utils.helper import non_numeric_mask
+from utils.station_index import StationIndex
+
+MANIFEST = silver.parent / "pipeline_manifest.json"
+UK_TZ = "Europe/London"
+
+# BigQuery types of the london_bicycles tables, as used in data_quality.ipynb
+TRIP_SCHEMA = {
+    "rental_id": "INTEGER",
+    "duration": "INTEGER",
+    "bike_id": "INTEGER",
+    "bike_model": "STRING",
+    "start_date": "TIMESTAMP",
+    "end_date": "TIMESTAMP",
+    "start_station_id": "INTEGER",
+    "start_station_name": "STRING",
+    "end_station_id": "INTEGER",
+    "end_station_name": "STRING",
+}
+STATION_SCHEMA = {
+    "id": "INTEGER",
+    "name": "STRING",
+    "terminal_name": "STRING",
+    "latitude": "FLOAT",
+    "longitude": "FLOAT",
+    "installed": "BOOLEAN",
+    "locked": "STRING",
+    "temporary": "BOOLEAN",
+    "bikes_count": "INTEGER",
+    "docks_count": "INTEGER",
+    "nbEmptyDocks": "INTEGER",
+    "install_date": "DATE",
+    "removal_date": "DATE",
+}
+
+
+@dataclass
+class Stage:
+    name: str
+    # partition key -> input files it is built from
+    partitions: Callable[[], dict[str, list[Path]]]
+    # builds one partition and returns the paths it wrote
+    build: Callable[[str, list[Path]], list[Path]]
+    # bump when the build logic changes so every partition is rebuilt
+    version: int = 1
+    parallel: bool = False
+    # build resumes from its own previous outputs, so they are kept on rebuild
+    # and only cleared by --force or a version bump
+    incremental: bool = False
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Bronze → Silver
+#
+
+
+def cast_columns(df, schema):
+    for col, bq_type in schema.items():
+        if col not in df.columns:
+            continue
+        if bq_type == "INTEGER":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif bq_type == "FLOAT":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        elif bq_type == "BOOLEAN":
+            df[col] = df[col].astype("boolean")
+        elif bq_type == "TIMESTAMP":
+            df[col] = pd.to_datetime(df[col], utc=True, errors="coerce").dt.tz_convert(
+                UK_TZ
+            )
+        elif bq_type == "DATE":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif bq_type == "STRING":
+            df[col] = df[col].astype("string")
+    return df
+
+
+def clean_stations(stations):
+    stations = cast_columns(stations, STATION_SCHEMA)
+    stations = stations.drop_duplicates(subset="id", keep="first")
+
+    # Impute docks_count ≤ 0 with the rounded median, as in data_quality.ipynb
+    median_docks = stations.loc[stations["docks_count"] > 0, "docks_count"].median()
+    stations.loc[stations["docks_count"] <= 0, "docks_count"] = round(median_docks)
+    return stations
+
+
+def clean_trips(trips, stations):
+    """
+    Bronze trips → Silver: DQ flags, cast columns, dedup and station codes. Returns
+    the trips and the encode_trips report of unknown / renamed stations.
+    """
+    # DQ flags, on the raw values before casting turns bad ones into NA
+    flags = {
+        "invalid_bike_id": non_numeric_mask(trips["bike_id"]),
+        "invalid_start_station_id": non_numeric_mask(trips["start_station_id"]),
+        "invalid_end_station_id": non_numeric_mask(trips["end_station_id"]),
+        "invalid_rental_id": non_numeric_mask(trips["rental_id"]),
+    }
+    trips = cast_columns(trips, TRIP_SCHEMA)
+    bad_duration = (trips["duration"] <= 0) | (trips["duration"] >= 86400)
+    trips = trips.assign(
+        invalid_year=~trips["start_date"].dt.year.between(2015, 2023),
+        # Plain bools the pages can index with; a missing duration counts as invalid
+        invalid_duration=bad_duration.fillna(True).astype(bool),
+        **flags,
+    )
+
+    # Same rental logged more than once: keep the first copy (year files never overlap)
+    duplicated = trips["rental_id"].notna() & trips.duplicated("rental_id")
+    trips = trips[~duplicated]
+
+    return StationIndex(stations).encode_trips(trips)
+
+
+def silver_stations_partitions():
+    return {"all": [bronze / "cycle_stations.parquet"]}
+
+
+def build_silver_stations(key, inputs):
+    out = silver / "cycle_stations.parquet"
+    clean_stations(pd.read_parquet(inputs[0])).to_parquet(out, index=False)
+    return [out]
+
+
+def silver_trips_partitions():
+    # One partition per Bronze year file; codes depend on the Silver stations too
+    return {
+        path.stem.removeprefix("cycle_hire_"): [path, silver / "cycle_stations.parquet"]
+        for path in sorted(bronze.glob("cycle_hire_*.parquet"))
+    }
+
+
+def build_silver_trips(key, inputs):
+    trips, station_report = clean_trips(
+        pd.read_parquet(inputs[0]), pd.read_parquet(inputs[1])
+    )
+
+    report_dir = silver / "station_report"
+    report_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [report_dir / f"part-{key}.parquet"]
+    station_report.to_parquet(outputs[0], index=False)
+
+    month = trips["start_date"].dt.strftime("%Y-%m").fillna("unknown")
+    for value, month_df in trips.groupby(month):
+        partition = silver / "cycle_hire" / f"month={value}"
+        partition.mkdir(parents=True, exist_ok=True)
+        out = partition / f"part-{key}.parquet"
+        month_df.to_parquet(out, index=False)
+        outputs.append(out)
+    return outputs
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Silver → Gold
+#
+
+
+def silver_months():
+    # Months that still hold a file; a partition folder alone says nothing
+    return sorted(
+        {
+            p.parent.name.removeprefix("month=")
+            for p in silver.glob("cycle_hire/*/*.parquet")
+        }
+    )
+
+
+def gold_snapshots_partitions():
+    # Windows on the 1st of a month reach back into the previous month's trips
+    months = [
+        m for m in silver_months() if m[:4].isdigit() and 2015 <= int(m[:4]) <= 2023
+    ]
+    stations = silver / "cycle_stations.parquet"
+    partitions = {}
+    for month in months:
+        previous = (pd.Period(month, "M") - 1).strftime("%Y-%m")
+        inputs = sorted((silver / "cycle_hire" / f"month={month}").glob("*.parquet"))
+        inputs += sorted(
+            (silver / "cycle_hire" / f"month={previous}").glob("*.parquet")
+        )
+        partitions[month] = inputs + [stations]
+    return partitions
+
+
+def build_gold_snapshots(key, inputs):
+    *trip_files, stations_file = inputs
+    trips = pd.concat(pd.read_parquet(p) for p in trip_files)
+    trips = trips.sort_values("start_date", kind="stable").reset_index(drop=True)
+    batch_reports.use_dataset(trips, pd.read_parquet(stations_file))
+
+    out_dir = gold / "snapshots"
+    outputs = []
+    month = pd.Period(key, "M")
+    for day in pd.date_range(month.start_time, month.end_time.normalize()).strftime(
+        "%Y-%m-%d"
+    ):
+        batch_reports.build_day(day, out_dir)
+        outputs += [out_dir / name / f"date={day}" for name in batch_reports.OUTPUTS]
+    return outputs
+
+
+def gold_bike_anomaly_partitions():
+    # Trips without a start date have no place in a bike's history
+    months = [m for m in silver_months() if m != "unknown"]
+    return {
+        "all": [
+            path
+            for month in months
+            for path in sorted(
+                (silver / "cycle_hire" / f"month={month}").glob("*.parquet")
+            )
+        ]
+        + [silver / "cycle_stations.parquet"]
+    }
+
+
+ANOMALY_STATE = gold / "bike_anomaly_state"
+
+
+def month_of(path):
+    return Path(path).parent.name.removeprefix("month=")
+
+
+def build_gold_bike_anomaly(key, inputs):
+    """
+    Per-bike state (recent trips + running totals) is kept next to the scores, so
+    a new month is fed on top of it instead of replaying every month since the
+    start. Any change to a month already ingested, or to the stations, replays
+    the full history.
+    """
+    *trip_files, stations_file = inputs
+    station_index = StationIndex(pd.read_parquet(stations_file))
+
+    meta_path = ANOMALY_STATE / "meta.json"
+    tail_path = ANOMALY_STATE / "tail.parquet"
+    totals_path = ANOMALY_STATE / "totals.parquet"
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+    cache = meta.get("files", {})
+    hashes = {str(path): file_hash(path, cache) for path in inputs}
+
+    ingested = meta.get("ingested", {})
+    new_files = [path for path in trip_files if str(path) not in ingested]
+    resume = (
+        ingested
+        and tail_path.exists()
+        and totals_path.exists()
+        and meta.get("stations") == hashes[str(stations_file)]
+        and all(hashes.get(path) == h for path, h in ingested.items())
+        and all(month_of(path) > max(map(month_of, ingested)) for path in new_files)
+    )
+    if resume:
+        state = {
+            "tail": pd.read_parquet(tail_path),
+            "totals": pd.read_parquet(totals_path),
+        }
+        print(f"  gold_bike_anomaly: {len(new_files)} new file(s) on the saved state")
+    else:
+        state, ingested, new_files = init_anomaly_state(), {}, trip_files
+
+    # Months in order, fed through the same incremental update as live ingestion
+    for path in new_files:
+        features = trip_features(pd.read_parquet(path), station_index)
+        state = update_anomaly_state(state, features.sort_values("start_date"))
+        ingested[str(path)] = hashes[str(path)]
+
+    ANOMALY_STATE.mkdir(parents=True, exist_ok=True)
+    state["tail"].to_parquet(tail_path, index=False)
+    state["totals"].to_parquet(totals_path)
+    meta_path.write_text(
+        json.dumps(
+            {
+                "stations": hashes[str(stations_file)],
+                "ingested": ingested,
+                "files": cache,
+            },
+            indent=2,
+        )
+    )
+
+    out = gold / "bike_anomaly.parquet"
+    score_bike_anomalies(state).to_parquet(out, index=False)
+    return [out, tail_path, totals_path, meta_path]
+
+
+STAGES = [
+    Stage("silver_stations", silver_stations_partitions, build_silver_stations),
+    Stage("silver_trips", silver_trips_partitions, build_silver_trips, version=2),
+    Stage(
+        "gold_snapshots",
+        gold_snapshots_partitions,
+        build_gold_snapshots,
+        version=4,
+        parallel=True,
+    ),
+    Stage(
+        "gold_bike_anomaly",
+        gold_bike_anomaly_partitions,
+        build_gold_bike_anomaly,
+        incremental=True,
+    ),
+]
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Runner
+#
+
+
+def file_hash(path, cache):
+    """
+    sha256 of the file contents, reused from the manifest while size and mtime match.
+    """
+    stat = path.stat()
+    cached = cache.get(str(path))
+    if (
+        cached
+        and cached["size"] == stat.st_size
+        and cached["mtime"] == stat.st_mtime_ns
+    ):
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    cache[str(path)] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+    return digest.hexdigest()
+
+
+def inputs_hash(stage, inputs, cache):
+    digest = hashlib.sha256(f"{stage.name}:{stage.version}".encode())
+    for path in inputs:
+        digest.update(str(path.relative_to(bronze.parent)).encode())
+        digest.update(file_hash(path, cache).encode())
+    return digest.hexdigest()
+
+
+def remove_outputs(paths):
+    for path in map(Path, paths):
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+        # Drop the partition folder once its last file is gone
+        if path.parent.is_dir() and not any(path.parent.iterdir()):
+            path.parent.rmdir()
+
+
+def run_stage(stage, manifest, force=False, workers=None):
+    done = manifest.setdefault("stages", {}).setdefault(stage.name, {})
+    cache = manifest.setdefault("files", {})
+    partitions = stage.partitions()
+
+    # Partitions whose inputs disappeared
+    for key in set(done) - set(partitions):
+        remove_outputs(done.pop(key)["outputs"])
+
+    todo = {}
+    for key, inputs in partitions.items():
+        missing = [p for p in inputs if not p.exists()]
+        if missing:
+            raise FileNotFoundError(f"{stage.name}[{key}] missing input: {missing[0]}")
+        h = inputs_hash(stage, inputs, cache)
+        previous = done.get(key)
+        outputs_exist = previous and all(Path(p).exists() for p in previous["outputs"])
+        if force or not outputs_exist or previous["inputs_hash"] != h:
+            todo[key] = (inputs, h)
+
+    print(
+        f"{stage.name}: {len(todo)} to build, {len(partitions) - len(todo)} unchanged"
+    )
+    if not todo:
+        return
+
+    for key in todo:
+        if key in done:
+            previous = done.pop(key)
+            if (
+                force
+                or not stage.incremental
+                or previous.get("version") != stage.version
+            ):
+                remove_outputs(previous["outputs"])
+
+    keys = list(todo)
+    inputs = [todo[k][0] for k in keys]
+    if stage.parallel and len(keys) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(stage.build, keys, inputs))
+    else:
+        results = [stage.build(k, i) for k, i in zip(keys, inputs)]
+
+    for key, outputs in zip(keys, results):
+        done[key] = {
+            "inputs_hash": todo[key][1],
+            "version": stage.version,
+            "outputs": [str(p) for p in outputs],
+        }
+        print(f"  built {stage.name}[{key}]")
+
+
+def run_pipeline(force=False, workers=None):
+    if not bronze.exists():
+        raise FileNotFoundError(f"Expected folder not found: {bronze.resolve()}")
+
+    manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+    silver.mkdir(parents=True, exist_ok=True)
+    gold.mkdir(parents=True, exist_ok=True)
+
+    try:
+        for stage in STAGES:
+            run_stage(stage, manifest, force=force, workers=workers)
+    finally:
+        # Keep what finished even if a later stage fails
+        MANIFEST.write_text(json.dumps(manifest, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--force", action="store_true", help="rebuild every partition")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    run_pipeline(force=args.force, workers=args.workers)
+    print(f"Pipeline finished in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
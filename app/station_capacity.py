@@ -1,16 +1,19 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import pytz
-from utils.data_loader import load_trips_data, load_stations_data
+import pydeck as pdk
+from utils.data_loader import (
+    load_gold_snapshot,
+    load_station_report,
+    load_stations_data,
+)
+from utils.station_index import StationIndex
 from utils.helper import (
-    get_bikes_at_station_date,
-    merge_station_status,
     build_ball_tree,
-    get_nearest_stations,
-    get_under_capacity_stations,
     find_suitable_rebalance_target,
+    plan_rebalancing_moves,
+    occupancy_map_layers,
 )
 
 
@@ -18,7 +21,6 @@ def show_station_capacity():
     st.subheader("🌇 Station Capacity & Rebalancing")
 
     # Load data
-    trips_df = load_trips_data()
     stations_df = load_stations_data()
 
     # Time window selection
@@ -34,25 +36,53 @@ def show_station_capacity():
         f"3-hour window: {start_dt.strftime('%H:%M')} to {end_dt.strftime('%H:%M')} on 17 June 2022"
     )
 
-    # Merge bike usage with station data
-    bikes_present = get_bikes_at_station_date(trips_df, start_dt, end_dt)
-    station_status = merge_station_status(stations_df, bikes_present)
+    # Occupancy over that window, precomputed by app/pipeline.py for every hour
+    snapshot = load_gold_snapshot("station_status", "2022-06-17", selected_hour)
 
-    # Rebalance suggestion from any station
-    st.markdown("### 🔁 Find Nearest Station to Redistribute From Selected Station")
-    station_options = station_status.set_index("name")
-    selected_station_name = st.selectbox(
-        "Choose a station to redistribute from:", station_options.index.tolist()
+    # Dense station codes: the snapshot is indexed by code, the same row as in the
+    # station index and the spatial tree, so lookups below are array indexing
+    station_index = StationIndex(stations_df)
+    station_status = station_index.stations.join(
+        snapshot.set_index("code")[["bikes_present", "capacity_pct", "status"]]
     )
+    station_status["at_capacity"] = station_status["status"] == "over_75"
+
+    # Spatial tree over station codes, shared by the map and the suggestions below
+    tree, latlon_rad = build_ball_tree(station_index.stations)
 
-    origin_row = station_options.loc[selected_station_name]
-    origin_station_id = origin_row["id"]
+    # Network-wide occupancy for the selected hour
+    st.markdown("### 🗺️ Network Occupancy")
+    moves = plan_rebalancing_moves(tree, latlon_rad, station_status)
+    st.pydeck_chart(
+        pdk.Deck(
+            map_style="mapbox://styles/mapbox/light-v9",
+            initial_view_state=pdk.ViewState(
+                latitude=np.nanmean(station_index.latitude),
+                longitude=np.nanmean(station_index.longitude),
+                zoom=11,
+            ),
+            layers=occupancy_map_layers(station_status, moves),
+            tooltip={"text": "{n}\n{c}% full"},
+        )
+    )
+    st.caption(
+        "Stations run from blue (empty) to red (full). Arcs go from each station "
+        "above 75% (red end) to the nearby station with the most free docks "
+        f"(green end): {len(moves)} suggested moves."
+    )
 
-    # Convert station ID to index in stations_df for spatial lookup
-    origin_idx = stations_df[stations_df["id"] == origin_station_id].index[0]
+    # Rebalance suggestion from any station
+    st.markdown("### 🔁 Find Nearest Station to Redistribute From Selected Station")
+    # Options are station codes, which double as the row in station_status and in
+    # the spatial tree
+    origin_idx = st.selectbox(
+        "Choose a station to redistribute from:",
+        range(len(station_index)),
+        format_func=lambda code: station_index.names[code],
+    )
+    selected_station_name = station_index.names[origin_idx]
 
-    # Build spatial tree and find nearest stations with ≥50% available docks
-    tree, latlon_rad = build_ball_tree(stations_df)
+    # Find nearest stations with ≥50% available docks
     candidates = find_suitable_rebalance_target(
         tree, latlon_rad, station_status, idx=origin_idx
     )
@@ -91,7 +121,7 @@ def show_station_capacity():
 
     # Show overutilised stations
     st.markdown("### 🚧 Stations Above 75% Capacity")
-    high_util = station_status[station_status["at_capacity"]]
+    high_util = snapshot[snapshot["status"] == "over_75"]
     if high_util.empty:
         st.info("No stations above 75% capacity.")
     else:
@@ -111,7 +141,9 @@ def show_station_capacity():
 
     # Show underutilised stations
     st.markdown("### 📉 Underutilised Stations (< 25% Capacity)")
-    underutilised = get_under_capacity_stations(station_status, capacity_threshold=0.25)
+    underutilised = snapshot[snapshot["status"] == "under_25"].sort_values(
+        "capacity_pct"
+    )
     if underutilised.empty:
         st.info("No underutilised stations found.")
     else:
@@ -127,3 +159,24 @@ def show_station_capacity():
             )
             .style.format({"% Capacity": "{:.0%}"})
         )
+
+    # Station references in the trips that don't match the station list
+    station_report = load_station_report()
+    if not station_report.empty:
+        with st.expander(
+            f"⚠️ {station_report['trips'].sum():,} trip ends reference unknown "
+            "or renamed stations"
+        ):
+            st.dataframe(
+                station_report.rename(
+                    columns={
+                        "issue": "Issue",
+                        "side": "Trip End",
+                        "station_id": "Station ID",
+                        "trip_station_name": "Name in Trips",
+                        "station_name": "Name in Station List",
+                        "trips": "Trips",
+                    }
+                ),
+                hide_index=True,
+            )
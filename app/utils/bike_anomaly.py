@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from utils.helper import haversine_m, non_numeric_mask
+
+# Per-trip behaviour tracked for every bike, with the labels shown on the page
+FEATURES = {
+    "duration_min": "Ride duration (min)",
+    "speed_m_per_min": "Distance per minute (m)",
+    "idle_h": "Hours between trips",
+    "dock_failure": "Dock / logging failure rate",
+}
+
+TAIL_COLUMNS = ["bike_id", "start_date", "end_date", *FEATURES]
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Trip features
+#
+
+
+def trip_features(trips, station_index):
+    """
+    One row per trip with the raw behaviour signals, from Silver trips (which carry
+    station codes) and the StationIndex they were coded against. idle_h is left
+    empty here because it depends on the bike's previous trip, which may be in an
+    earlier batch.
+    """
+    df = trips[["bike_id", "start_date", "end_date", "duration"]].copy()
+    df["start_date"] = pd.to_datetime(df["start_date"], utc=True)
+    df["end_date"] = pd.to_datetime(df["end_date"], utc=True)
+    # Plain floats, so Int64 / Float64 columns from Silver don't bring pd.NA along
+    for col in ["bike_id", "duration"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    df = df.dropna(subset=["bike_id", "start_date"])
+
+    bad_duration = (df["duration"] <= 0) | (df["duration"] >= 86400)
+    df["dock_failure"] = (
+        bad_duration
+        | non_numeric_mask(trips.loc[df.index, "start_station_id"])
+        | non_numeric_mask(trips.loc[df.index, "end_station_id"])
+    ).astype(float)
+    df["duration_min"] = (df["duration"] / 60).where(~bad_duration)
+
+    # Station coordinates by dense code; unknown stations (-1) get no distance
+    start = trips.loc[df.index, "start_station_code"].to_numpy(dtype=int)
+    end = trips.loc[df.index, "end_station_code"].to_numpy(dtype=int)
+    lat, lon = station_index.latitude, station_index.longitude
+    distance_m = np.where(
+        (start >= 0) & (end >= 0),
+        haversine_m(lat[start], lon[start], lat[end], lon[end]),
+        np.nan,
+    )
+    df["speed_m_per_min"] = distance_m / df["duration_min"]
+
+    df["idle_h"] = np.nan
+    return df[TAIL_COLUMNS]
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Incremental state
+#
+
+
+def init_anomaly_state():
+    """
+    Running state per bike: `tail` keeps each bike's most recent trips (enough for
+    the rolling window and the next idle gap) and `totals` keeps count / sum / sum of
+    squares per feature over the bike's whole history.
+    """
+    totals_columns = [
+        f"{stat}_{feature}" for feature in FEATURES for stat in ("n", "sum", "sumsq")
+    ]
+    return {
+        "tail": pd.DataFrame(columns=TAIL_COLUMNS),
+        "totals": pd.DataFrame(
+            columns=totals_columns, index=pd.Index([], name="bike_id"), dtype=float
+        ),
+    }
+
+
+def feature_totals(df):
+    grouped = df.groupby("bike_id")[list(FEATURES)]
+    counts, sums = grouped.count(), grouped.sum()
+    sumsq = (df[list(FEATURES)] ** 2).groupby(df["bike_id"]).sum()
+    return pd.concat(
+        [counts.add_prefix("n_"), sums.add_prefix("sum_"), sumsq.add_prefix("sumsq_")],
+        axis=1,
+    ).astype(float)
+
+
+def update_anomaly_state(state, features, window=20):
+    """
+    Ingest a batch of trip features (from `trip_features`) in chronological order.
+    Only the batch and the stored tails are touched, so cost scales with the batch,
+    not with the bike's full history.
+    """
+    combined = features.assign(_new=True)
+    if not state["tail"].empty:
+        combined = pd.concat(
+            [state["tail"].assign(_new=False), combined], ignore_index=True
+        )
+    combined = combined.sort_values(["bike_id", "start_date"], kind="stable")
+
+    previous_end = combined.groupby("bike_id")["end_date"].shift()
+    idle_h = (combined["start_date"] - previous_end).dt.total_seconds() / 3600
+    combined.loc[combined["_new"], "idle_h"] = idle_h.clip(lower=0)
+
+    batch_totals = feature_totals(combined[combined["_new"]])
+    totals = state["totals"].add(batch_totals, fill_value=0)[state["totals"].columns]
+
+    tail = combined.groupby("bike_id").tail(window)[TAIL_COLUMNS].reset_index(drop=True)
+    return {"tail": tail, "totals": totals}
+
+
+# --------------------------------------------------------------------------------------------#
+
+#
+# Scoring
+#
+
+
+def rolling_bike_stats(tail, window=20):
+    """
+    Grouped rolling mean / sum / sum of squares / count per feature over each bike's
+    last `window` trips, one row per trip.
+    """
+    values = tail[list(FEATURES)]
+    rolled = {}
+    for name, frame in (("", values), ("sq_", values**2)):
+        grouped = frame.groupby(tail["bike_id"]).rolling(window, min_periods=1)
+        rolled[f"{name}sum"] = grouped.sum()
+        if not name:
+            rolled["count"] = grouped.count()
+    return rolled
+
+
+def score_bike_anomalies(state, window=20, min_history=30):
+    """
+    Ranks bikes by how far their last `window` trips have drifted from their own
+    earlier behaviour. Each feature gets a z-score of the recent mean against the
+    bike's baseline, and anomaly_score is the root mean square of those z-scores.
+    """
+    tail, totals = state["tail"], state["totals"]
+    if tail.empty:
+        return pd.DataFrame(columns=["bike_id", "anomaly_score", "main_driver"])
+
+    rolled = rolling_bike_stats(tail, window)
+    # Last rolling row per bike == the stats over its current window
+    latest = {
+        key: frame[~frame.index.get_level_values(0).duplicated(keep="last")]
+        .droplevel(1)
+        .reindex(totals.index)
+        for key, frame in rolled.items()
+    }
+
+    features = list(FEATURES)
+    n, s, sq = (
+        totals[[f"{stat}_{f}" for f in features]].set_axis(features, axis=1)
+        for stat in ("n", "sum", "sumsq")
+    )
+    win_n, win_s, win_sq = latest["count"], latest["sum"], latest["sq_sum"]
+
+    recent_mean = win_s / win_n
+    base_n = n - win_n
+    base_mean = (s - win_s) / base_n
+    base_var = ((sq - win_sq) / base_n - base_mean**2).clip(lower=0)
+
+    # Stop bikes with a near-constant baseline (e.g. no failures yet) from scoring
+    # a couple of unlucky trips as a huge drift
+    fleet_var = (sq.sum() / n.sum() - (s.sum() / n.sum()) ** 2).clip(lower=0)
+    floor = 0.5 * fleet_var
+    z = (recent_mean - base_mean) / np.sqrt(base_var.clip(lower=floor, axis=1) / win_n)
+    z = z.where(base_n >= min_history).dropna(how="all")
+
+    ranked = pd.DataFrame(
+        {
+            "anomaly_score": np.sqrt((z**2).mean(axis=1)),
+            "main_driver": z.abs().fillna(-1).idxmax(axis=1).map(FEATURES),
+            "trips": n["dock_failure"].reindex(z.index),
+        }
+    )
+    for feature in features:
+        ranked[f"recent_{feature}"] = recent_mean[feature].reindex(z.index)
+        ranked[f"baseline_{feature}"] = base_mean[feature].reindex(z.index)
+
+    ranked = ranked.sort_values("anomaly_score", ascending=False)
+    ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+    return (
+        ranked.rename_axis("bike_id")
+        .reset_index()
+        .astype({"bike_id": "Int64", "trips": int})
+    )
@@ -1,31 +1,84 @@
-from pathlib import Path
-import pandas as pd
 import os
-from google.cloud import bigquery
-
+from functools import cache
 from pathlib import Path
 
-from pathlib import Path
+import pandas as pd
 
 # this file lives in app/utils/ -> go up 2 levels to project root
 BASE = Path(__file__).resolve().parents[2]
-store = BASE / "eda" / "storage" / "Bronze"
+# BIKE_HIRE_STORAGE points the pipeline and the pages at another storage folder
+# (app/load_test.py uses one filled with synthetic data)
+STORAGE = Path(os.environ.get("BIKE_HIRE_STORAGE", BASE / "eda" / "storage"))
+store = STORAGE / "Bronze"
+silver = STORAGE / "Silver"
+gold = STORAGE / "Gold"
 
-if not store.exists():
-    raise FileNotFoundError(f"Expected folder not found: {store.resolve()}")
+
+# Pages read the pipeline outputs (app/pipeline.py), not raw Bronze
+def load_trips_data(months=None):
+    """
+    Silver trips, optionally only the given "YYYY-MM" month partitions.
+    """
+    path = silver / "cycle_hire"
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Missing folder: {path.resolve()} (run app/pipeline.py to build it)"
+        )
+    filters = [("month", "in", list(months))] if months else None
+    return pd.read_parquet(path, filters=filters).drop(columns="month")
 
 
-def load_trips_data():
-    path = store / "cycle_hire_2022.parquet"
+def load_stations_data():
+    path = silver / "cycle_stations.parquet"
     if not path.exists():
-        raise FileNotFoundError(f"Missing file: {path.resolve()}")
+        raise FileNotFoundError(
+            f"Missing file: {path.resolve()} (run app/pipeline.py to build it)"
+        )
     return pd.read_parquet(path)
 
 
-def load_stations_data():
-    path = store / "cycle_stations.parquet"
+def load_station_report():
+    """
+    Trip ends at stations missing from (or renamed in) the station list.
+    """
+    path = silver / "station_report"
     if not path.exists():
-        raise FileNotFoundError(f"Missing file: {path.resolve()}")
+        raise FileNotFoundError(
+            f"Missing folder: {path.resolve()} (run app/pipeline.py to build it)"
+        )
+    report = pd.read_parquet(path)
+    # One file per Bronze year; the same station can show up in several
+    return (
+        report.groupby(
+            ["issue", "side", "station_id", "trip_station_name", "station_name"],
+            dropna=False,
+        )["trips"]
+        .sum()
+        .reset_index()
+        .sort_values("trips", ascending=False, ignore_index=True)
+    )
+
+
+def load_gold_snapshot(name, date, hour=None):
+    """
+    One day of a Gold snapshot table (kpi, station_status or flagged_bikes),
+    optionally only the given hour.
+    """
+    path = gold / "snapshots" / name / f"date={date}"
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Missing folder: {path.resolve()} (run app/pipeline.py to build it)"
+        )
+    filters = [("hour", "==", hour)] if hour is not None else None
+    return pd.read_parquet(path, filters=filters)
+
+
+def load_gold_table(name):
+    path = gold / f"{name}.parquet"
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Missing file: {path.resolve()} (run app/pipeline.py to build it)"
+        )
     return pd.read_parquet(path)
 
 
@@ -35,4 +88,12 @@ location = "EU"
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = (
     r"C:\Users\msidh\Documents\Coding\London Bicycle Hires App\credentials\bq_viewer_key.json"
 )
-client = bigquery.Client(project=project, location=location)
+
+
+# The pages only read local parquet, so the client (and google-cloud-bigquery)
+# is only needed once something actually queries BigQuery
+@cache
+def get_bigquery_client():
+    from google.cloud import bigquery
+
+    return bigquery.Client(project=project, location=location)
@@ -1,8 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import pytz
 import pydeck as pdk
 from sklearn.neighbors import BallTree
 
@@ -15,18 +13,27 @@ def non_numeric_mask(series):
     return ~series.astype(str).str.isnumeric()
 
 
-def dq_validity_bike_hire(df, return_masks=False):
-    df = df.copy()
-    df["start_date"] = pd.to_datetime(df["start_date"], errors="coerce")
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in metres between points given in degrees.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
 
-    # Define all validation rules
+def dq_validity_bike_hire(df, return_masks=False):
+    # One Silver invalid_* flag per rule, set by app/pipeline.py from the raw values
     masks = {
-        "Year not 2015-2023": ~df["start_date"].dt.year.between(2015, 2023),
-        "Duration ≤ 0 OR ≥ 86400": (df["duration"] <= 0) | (df["duration"] >= 86400),
-        "bike_id non-numeric": non_numeric_mask(df["bike_id"]),
-        "start_station_id non-numeric": non_numeric_mask(df["start_station_id"]),
-        "end_station_id non-numeric": non_numeric_mask(df["end_station_id"]),
-        "rental_id non-numeric": non_numeric_mask(df["rental_id"]),
+        "Year not 2015-2023": df["invalid_year"],
+        "Duration ≤ 0 OR ≥ 86400": df["invalid_duration"],
+        "bike_id non-numeric": df["invalid_bike_id"],
+        "start_station_id non-numeric": df["invalid_start_station_id"],
+        "end_station_id non-numeric": df["invalid_end_station_id"],
+        "rental_id non-numeric": df["invalid_rental_id"],
     }
 
     # Build summary table
@@ -44,6 +51,54 @@ def dq_validity_bike_hire(df, return_masks=False):
     return (summary, masks) if return_masks else summary
 
 
+# ------------------------------------------------------------------------------------------------#
+
+#
+# KPI Summary
+#
+
+
+def summarise_trips(df):
+    """
+    Headline KPIs for a slice of trips, as shown on the Overview page.
+    """
+    if df.empty:
+        return {
+            "trips": 0,
+            "unique_bikes": 0,
+            "stations_used": 0,
+            "busiest_start": "N/A",
+            "busiest_end": "N/A",
+            "top_bike": "N/A",
+            "top_bike_trips": 0,
+            "bikes_with_issues": 0,
+            "top_faulty_bike": "N/A",
+            "top_faulty_bike_issues": 0,
+        }
+
+    bike_counts = df["bike_id"].value_counts()
+
+    # Run data quality check
+    _, dq_masks = dq_validity_bike_hire(df, return_masks=True)
+    issue_mask = pd.concat(dq_masks.values(), axis=1).any(axis=1)
+    faulty_counts = df.loc[issue_mask, "bike_id"].astype(str).value_counts()
+
+    return {
+        "trips": len(df),
+        "unique_bikes": df["bike_id"].nunique(),
+        "stations_used": pd.concat(
+            [df["start_station_id"], df["end_station_id"]]
+        ).nunique(),
+        "busiest_start": df["start_station_name"].value_counts().idxmax(),
+        "busiest_end": df["end_station_name"].value_counts().idxmax(),
+        "top_bike": bike_counts.idxmax(),
+        "top_bike_trips": bike_counts.max(),
+        "bikes_with_issues": df.loc[issue_mask, "bike_id"].nunique(),
+        "top_faulty_bike": faulty_counts.idxmax() if not faulty_counts.empty else "N/A",
+        "top_faulty_bike_issues": faulty_counts.max() if not faulty_counts.empty else 0,
+    }
+
+
 # ------------------------------------------------------------------------------------------------#
 
 #
@@ -70,15 +125,9 @@ def bikes_to_be_concerned(df, speed_kmh=15.0):
             col in df.columns
             for col in ["start_lat", "start_lon", "end_lat", "end_lon"]
         ):
-            lat1, lon1, lat2, lon2 = map(
-                np.radians,
-                [df["start_lat"], df["start_lon"], df["end_lat"], df["end_lon"]],
+            df["distance_m"] = haversine_m(
+                df["start_lat"], df["start_lon"], df["end_lat"], df["end_lon"]
             )
-            a = (
-                np.sin((lat2 - lat1) / 2) ** 2
-                + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
-            )
-            df["distance_m"] = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
         else:
             df["distance_m"] = df["duration"] * (speed_kmh * 1000 / 3600)
     total_dist = (
@@ -91,24 +140,22 @@ def bikes_to_be_concerned(df, speed_kmh=15.0):
 
 
 def dq_validity_bike_triage(df, return_masks=False):
+    # Same Silver flags as dq_validity_bike_hire, with operational labels
     masks = {
-        "⚠️ Year not in 2015–2023 (possible test/faulty clock)": ~df[
-            "start_date"
-        ].dt.year.between(2015, 2023),
-        "⏱️ Duration ≤ 0 or > 24h (possible logging or docking error)": (
-            df["duration"] <= 0
-        )
-        | (df["duration"] >= 86400),
-        "🔧 Bike ID not recognised (likely unregistered or test bike)": non_numeric_mask(
-            df["bike_id"]
-        ),
-        "📍 Start station invalid (bike may not have docked in)": non_numeric_mask(
-            df["start_station_id"]
-        ),
-        "📍 End station invalid (bike may not have docked out)": non_numeric_mask(
-            df["end_station_id"]
-        ),
-        "🧾 Rental session corrupt or missing ID": non_numeric_mask(df["rental_id"]),
+        "⚠️ Year not in 2015–2023 (possible test/faulty clock)": df["invalid_year"],
+        "⏱️ Duration ≤ 0 or > 24h (possible logging or docking error)": df[
+            "invalid_duration"
+        ],
+        "🔧 Bike ID not recognised (likely unregistered or test bike)": df[
+            "invalid_bike_id"
+        ],
+        "📍 Start station invalid (bike may not have docked in)": df[
+            "invalid_start_station_id"
+        ],
+        "📍 End station invalid (bike may not have docked out)": df[
+            "invalid_end_station_id"
+        ],
+        "🧾 Rental session corrupt or missing ID": df["invalid_rental_id"],
     }
 
     summary = {rule: mask.sum() for rule, mask in masks.items()}
@@ -123,50 +170,34 @@ def dq_validity_bike_triage(df, return_masks=False):
     return summary_df
 
 
-# ------------------------------------------------------------------------------------------------------------------------------#
+def label_bike_issues(df):
+    """
+    Returns the trips failing any triage rule, with every failed rule listed in
+    `bike_issue`, plus the per-rule masks.
+    """
+    _, masks = dq_validity_bike_triage(df, return_masks=True)
 
-#
-# Station Capacity
-#
+    # Combine all masks into one issue mask
+    issue_mask = pd.concat(masks.values(), axis=1).any(axis=1)
+    triage_df = df[issue_mask].copy()
 
+    # Add issue labels to the triage DataFrame
+    triage_df["bike_issue"] = ""
+    for rule, mask in masks.items():
+        triage_df.loc[mask[issue_mask], "bike_issue"] += rule + "; "
 
-def get_bikes_at_station_date(df, start_dt, end_dt):
-    df_window = df[(df["end_date"] >= start_dt) & (df["end_date"] < end_dt)]
-    return (
-        df_window.groupby("end_station_id")["bike_id"]
-        .nunique()
-        .reset_index(name="bikes_present")
+    # Silver nulls ids that weren't numeric; keep those rows selectable as one bike
+    triage_df["bike_id"] = (
+        triage_df["bike_id"].astype("string").fillna("unrecognised").astype(str)
     )
+    return triage_df, masks
 
 
-def get_bikes_at_station_right_now(df):
-    """
-    Returns number of bikes at each end station up to the simulated current time (17 June 2022 with today's clock).
-    """
-    uk_tz = pytz.timezone("Europe/London")
-    now_uk = datetime.now(uk_tz)
-    hour_minute = now_uk.strftime("%H:%M")
-    reference_now = pd.Timestamp(f"2022-06-17 {hour_minute}", tz=uk_tz)
-    one_hour_ago = reference_now - timedelta(hours=1)
-
-    df_filtered = df[
-        (df["end_date"] >= one_hour_ago) & (df["end_date"] < reference_now)
-    ]
-
-    # Count unique bike IDs per end station
-    return (
-        df_filtered.groupby("end_station_id")["bike_id"]
-        .nunique()
-        .reset_index(name="bikes_present")
-    )
-
+# ------------------------------------------------------------------------------------------------------------------------------#
 
-def merge_station_status(stations, bikes, thresh=0.75):
-    merged = stations.merge(bikes, left_on="id", right_on="end_station_id", how="left")
-    merged["bikes_present"] = merged["bikes_present"].fillna(0).astype(int)
-    merged["capacity_pct"] = merged["bikes_present"] / merged["docks_count"]
-    merged["at_capacity"] = merged["capacity_pct"] >= thresh
-    return merged
+#
+# Station Capacity
+#
 
 
 def build_ball_tree(df):
@@ -216,3 +247,86 @@ def find_suitable_rebalance_target(tree, coords, df, idx, k=5):
         .sort_values("available_ratio", ascending=False)
         .reset_index(drop=True)
     )
+
+
+def plan_rebalancing_moves(tree, coords, df, k=5):
+    """
+    For every station at capacity, picks the neighbour (out of its k nearest) with the
+    most free docks, keeping only neighbours with at least 50% free. Same rule as
+    find_suitable_rebalance_target, but one tree query for all stations.
+    """
+    origins = np.flatnonzero(df["at_capacity"].to_numpy())
+    if len(origins) == 0:
+        return pd.DataFrame(columns=["from_idx", "to_idx", "distance_m"])
+
+    dist, ids = tree.query(coords[origins], k=k + 1)
+    dists_m, ids = dist[:, 1:] * EARTH_RADIUS_M, ids[:, 1:]  # exclude self
+
+    docks = df["docks_count"].to_numpy(dtype=float)
+    bikes = df["bikes_present"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (docks[ids] - bikes[ids]) / docks[ids]
+    ratio = np.where(ratio >= 0.5, ratio, -np.inf)
+
+    rows = np.arange(len(origins))
+    best = ratio.argmax(axis=1)
+    found = np.isfinite(ratio[rows, best])
+    return pd.DataFrame(
+        {
+            "from_idx": origins[found],
+            "to_idx": ids[rows, best][found],
+            "distance_m": dists_m[rows, best][found].round(1),
+        }
+    )
+
+
+def occupancy_map_layers(df, moves):
+    """
+    Station dots coloured by capacity_pct plus arcs for the rebalancing moves.
+    pydeck still sends one JSON record per station / arc, and the whole payload
+    again on every rerun; it is just kept small by sending only the columns the
+    layers need, rounded, with the colour ramp evaluated in the browser.
+    """
+    lon = df["longitude"].to_numpy(dtype=float).round(5)
+    lat = df["latitude"].to_numpy(dtype=float).round(5)
+    pct = (df["capacity_pct"].fillna(0).clip(0, 1) * 100).round().astype(int)
+
+    points = pd.DataFrame({"lon": lon, "lat": lat, "c": pct, "n": df["name"]})
+    src, dst = moves["from_idx"].to_numpy(int), moves["to_idx"].to_numpy(int)
+    arcs = pd.DataFrame(
+        {
+            "slon": lon[src],
+            "slat": lat[src],
+            "tlon": lon[dst],
+            "tlat": lat[dst],
+            "c": pct.to_numpy()[src],
+            "n": df["name"].to_numpy()[src] + " → " + df["name"].to_numpy()[dst],
+        }
+    )
+
+    # Fixed ids keep the layers (and the view) stable across reruns; their data is
+    # still replaced wholesale each time
+    return [
+        pdk.Layer(
+            "ScatterplotLayer",
+            id="station-occupancy",
+            data=points,
+            get_position=["lon", "lat"],
+            # Blue when empty through to red when full
+            get_fill_color="[2.55 * c, 60, 255 - 2.55 * c, 190]",
+            get_radius=60,
+            radius_min_pixels=2,
+            pickable=True,
+        ),
+        pdk.Layer(
+            "ArcLayer",
+            id="rebalancing-moves",
+            data=arcs,
+            get_source_position=["slon", "slat"],
+            get_target_position=["tlon", "tlat"],
+            get_source_color=[215, 48, 39, 220],
+            get_target_color=[26, 152, 80, 220],
+            get_width=3,
+            pickable=True,
+        ),
+    ]
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+class StationIndex:
+    """
+    Station dimension with dense codes 0..n-1 in the order of the stations table.
+
+    Ids and names map to codes once, and coordinates / docks are held as contiguous
+    arrays, so joins, occupancy and map lookups are plain array indexing. Any code
+    of -1 means the station is not in the table.
+    """
+
+    def __init__(self, stations):
+        self.stations = stations.reset_index(drop=True)
+        ids = pd.to_numeric(self.stations["id"], errors="coerce")
+        names = self.stations["name"].astype(str)
+
+        # Repeated ids / names resolve to their first row
+        first_id = ~ids.duplicated() & ids.notna()
+        self.id_index = pd.Index(ids[first_id].to_numpy())
+        self.id_codes = np.flatnonzero(first_id)
+        self.name_index = pd.Index(names[~names.duplicated()].to_numpy())
+        self.name_codes = np.flatnonzero(~names.duplicated())
+
+        self.ids = ids.to_numpy()
+        self.names = names.to_numpy()
+        self.latitude, self.longitude, self.docks_count = (
+            self.stations[col].to_numpy(dtype=float, na_value=np.nan)
+            for col in ["latitude", "longitude", "docks_count"]
+        )
+
+    def __len__(self):
+        return len(self.stations)
+
+    def codes_for_ids(self, ids):
+        pos = self.id_index.get_indexer(pd.to_numeric(pd.Series(ids), errors="coerce"))
+        return np.where(pos >= 0, self.id_codes[pos], -1)
+
+    def codes_for_names(self, names):
+        pos = self.name_index.get_indexer(pd.Series(names).astype(str))
+        return np.where(pos >= 0, self.name_codes[pos], -1)
+
+    def encode_trips(self, trips):
+        """
+        Adds start_station_code / end_station_code to the trips and returns them with
+        a report of station references that don't line up with the table: ids that
+        are missing from it, and ids whose trip name differs (renamed stations).
+        """
+        trips = trips.copy()
+        reports = []
+        for end in ["start", "end"]:
+            trips[f"{end}_station_code"] = self.codes_for_ids(
+                trips[f"{end}_station_id"]
+            )
+
+            # Check each distinct id/name pair once rather than every trip. Trips with
+            # no id at all are left to the invalid_*_station_id flags
+            refs = (
+                trips[trips[f"{end}_station_id"].notna()]
+                .groupby(
+                    [f"{end}_station_id", f"{end}_station_name"],
+                    dropna=False,
+                    observed=True,
+                )
+                .size()
+                .reset_index(name="trips")
+                .set_axis(["station_id", "trip_station_name", "trips"], axis=1)
+            )
+            codes = self.codes_for_ids(refs["station_id"])
+            known = codes >= 0
+            refs["station_name"] = np.where(known, self.names[codes], None)
+            # Silver names are nullable strings, so a missing one compares as NA
+            renamed = refs["trip_station_name"] != refs["station_name"]
+            refs["issue"] = np.select(
+                [~known, renamed.fillna(True).to_numpy(bool)],
+                ["unknown id", "renamed"],
+                default="",
+            )
+            reports.append(refs[refs["issue"] != ""].assign(side=end))
+
+        report = pd.concat(reports, ignore_index=True)[
+            [
+                "issue",
+                "side",
+                "station_id",
+                "trip_station_name",
+                "station_name",
+                "trips",
+            ]
+        ].sort_values("trips", ascending=False, ignore_index=True)
+        return trips, report
+
+    def occupancy(self, trips):
+        """
+        Unique bikes per station among `trips`, by end_station_code, as an array
+        aligned with the codes. Trips at unknown stations are left out here and
+        show up in the encode_trips report instead.
+        """
+        pairs = pd.DataFrame(
+            {"code": trips["end_station_code"], "bike_id": trips["bike_id"]}
+        )
+        pairs = pairs[pairs["code"] >= 0].drop_duplicates()
+        return np.bincount(pairs["code"].to_numpy(dtype=int), minlength=len(self))
+
+    def status(self, bikes_present, thresh=0.75):
+        status = self.stations.copy()
+        status["bikes_present"] = np.asarray(bikes_present).astype(int)
+        status["capacity_pct"] = status["bikes_present"] / self.docks_count
+        status["at_capacity"] = status["capacity_pct"] >= thresh
+        return status